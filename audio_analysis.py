@@ -0,0 +1,459 @@
+import os
+import re
+import json
+import base64
+import hashlib
+import tempfile
+import subprocess
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅分析功能需要
+    np = None
+
+
+# 分析参数（修改后需同步提升 ANALYSIS_VERSION，使旧缓存失效）
+ANALYSIS_VERSION = 2
+ANALYSIS_SAMPLE_RATE = 16000  # 分析用采样率，足以覆盖人声频段
+FRAME_DURATION = 0.02  # 每帧20毫秒
+SPEECH_THRESHOLD_DB = 10.0  # 高于噪声底多少dB视为人声
+SPEECH_HANGOVER_FRAMES = 10  # 人声结束后保持的帧数，避免字间断裂
+LEVEL_FLOOR_DB = -90.0  # 电平下限，数字静音按此计算，不参与噪声底估计
+STREAM_BLOCK_FRAMES = 500  # 流式分析时每次读取的帧数（20毫秒帧，约10秒）
+
+# 指纹参数（修改后需同步提升 FINGERPRINT_VERSION，使旧索引失效）
+FINGERPRINT_VERSION = 3
+FINGERPRINT_SAMPLE_RATE = 8000
+FINGERPRINT_DURATION = 30  # 只解码开头30秒（跳过前导静音后）
+FINGERPRINT_FFT_SIZE = 2048
+FINGERPRINT_HOP_SIZE = 256
+FINGERPRINT_BANDS = 33  # 相邻频带能量差产生每帧32位哈希
+FINGERPRINT_MIN_FREQ = 300
+FINGERPRINT_MAX_FREQ = 2000
+FINGERPRINT_MAX_OFFSET = 8  # 容许的帧偏移（编码器延迟等），约0.26秒
+DUPLICATE_BER_THRESHOLD = 0.2  # 误码率低于该值视为同一录音
+DUPLICATE_DURATION_TOLERANCE = 1.0  # 时长差异容限（秒）
+QUICK_HASH_BYTES = 4 * 1024 * 1024  # 指纹索引键只读取文件开头4MB
+
+
+# 内容哈希缓存 {绝对路径: [文件大小, 修改时间(ns), 哈希]}，文件未变化时无需重新读取
+_content_hashes = {}
+_loaded_hash_indexes = set()
+
+
+def _require_numpy():
+    if np is None:
+        raise Exception("音频分析需要安装numpy: pip install numpy")
+
+
+def compute_content_hash(file_path, chunk_size=1024 * 1024):
+    """计算文件内容哈希，作为分析缓存的键"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def compute_quick_hash(file_path, head_bytes=QUICK_HASH_BYTES):
+    """计算文件开头部分与文件大小的哈希，作为指纹索引的键（无需读取整个文件）"""
+    sha = hashlib.sha256()
+    sha.update(str(os.path.getsize(file_path)).encode("ascii"))
+    with open(file_path, "rb") as f:
+        sha.update(f.read(head_bytes))
+    return sha.hexdigest()
+
+
+def _load_hash_index(hash_index_path):
+    if hash_index_path in _loaded_hash_indexes:
+        return
+    _loaded_hash_indexes.add(hash_index_path)
+    try:
+        with open(hash_index_path, "r", encoding="utf-8") as f:
+            for path, entry in json.load(f).items():
+                _content_hashes.setdefault(path, entry)
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, IOError, AttributeError) as e:
+        print(f"加载哈希索引时出错: {e}")
+
+
+def get_content_hash(file_path, hash_index_path=None):
+    """获取文件内容哈希：先按 (路径, 大小, 修改时间) 查找，未命中才读取整个文件
+
+    同一进程内的分析和指纹识别共享结果；hash_index_path 用于跨次运行复用，需调用 save_content_hashes 保存。
+    """
+    if hash_index_path:
+        _load_hash_index(hash_index_path)
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    entry = _content_hashes.get(path)
+    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+        return entry[2]
+    content_hash = compute_content_hash(path)
+    _content_hashes[path] = [stat.st_size, stat.st_mtime_ns, content_hash]
+    return content_hash
+
+
+def save_content_hashes(hash_index_path):
+    """保存内容哈希索引（每批处理结束时调用一次）"""
+    temp_path = hash_index_path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(_content_hashes, f, ensure_ascii=False)
+        os.replace(temp_path, hash_index_path)
+    except IOError as e:
+        print(f"保存哈希索引时出错: {e}")
+
+
+def decode_pcm(file_path, sample_rate=ANALYSIS_SAMPLE_RATE, start_time=None, duration=None, pre_filters=None):
+    """使用ffmpeg解码为单声道float32 PCM，返回 (采样数组, ffmpeg日志)"""
+    _require_numpy()
+    cmd = ["ffmpeg", "-hide_banner", "-nostats"]
+    if start_time is not None:
+        # 输入端seek，只解码需要的窗口
+        cmd.extend(["-ss", str(start_time)])
+    cmd.extend(["-i", file_path])
+    if duration is not None:
+        cmd.extend(["-t", str(duration)])
+    if pre_filters:
+        cmd.extend(["-af", pre_filters])
+    cmd.extend(["-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"])
+
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"解码音频失败: {str(e)}")
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    return samples, result.stderr.decode("utf-8", errors="replace")
+
+
+def frame_rms(samples, sample_rate=ANALYSIS_SAMPLE_RATE, frame_duration=FRAME_DURATION):
+    """计算逐帧RMS包络"""
+    _require_numpy()
+    frame_size = max(1, int(round(sample_rate * frame_duration)))
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size).astype(np.float64)
+    return np.sqrt(np.mean(frames ** 2, axis=1)).astype(np.float32)
+
+
+def stream_rms_envelope(file_path, pre_filters=None, sample_rate=ANALYSIS_SAMPLE_RATE, frame_duration=FRAME_DURATION):
+    """流式解码并逐块计算RMS包络，内存中只保留包络
+
+    返回 (RMS包络, 采样总数, 采样平方和, ffmpeg日志)。
+    """
+    _require_numpy()
+    frame_size = max(1, int(round(sample_rate * frame_duration)))
+    block_bytes = frame_size * STREAM_BLOCK_FRAMES * 4
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-i", file_path]
+    if pre_filters:
+        cmd.extend(["-af", pre_filters])
+    cmd.extend(["-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"])
+
+    envelopes = []
+    total_samples = 0
+    sum_squares = 0.0
+    pending = b""
+    # 日志写入临时文件，避免stderr管道写满导致ffmpeg阻塞
+    with tempfile.TemporaryFile() as log_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log_file)
+        try:
+            while True:
+                chunk = process.stdout.read(block_bytes)
+                if not chunk:
+                    break
+                data = pending + chunk
+                usable = len(data) // (frame_size * 4) * frame_size * 4
+                pending = data[usable:]
+                if usable == 0:
+                    continue
+                frames = np.frombuffer(data[:usable], dtype=np.float32).astype(np.float64).reshape(-1, frame_size)
+                squares = np.mean(frames ** 2, axis=1)
+                envelopes.append(np.sqrt(squares).astype(np.float32))
+                total_samples += frames.size
+                sum_squares += float(np.sum(squares)) * frame_size
+        finally:
+            process.stdout.close()
+            return_code = process.wait()
+        log_file.seek(0)
+        log = log_file.read().decode("utf-8", errors="replace")
+
+    if return_code != 0:
+        raise Exception(f"解码音频失败: ffmpeg 返回 {return_code}")
+
+    # 末尾不足一帧的采样只计入总量，不生成包络帧
+    tail = np.frombuffer(pending[:len(pending) // 4 * 4], dtype=np.float32).astype(np.float64)
+    total_samples += len(tail)
+    sum_squares += float(np.sum(tail ** 2))
+    rms_envelope = np.concatenate(envelopes) if envelopes else np.zeros(0, dtype=np.float32)
+    return rms_envelope, total_samples, sum_squares, log
+
+
+def _to_db(values):
+    return np.maximum(20.0 * np.log10(np.maximum(values, 1e-10)), LEVEL_FLOOR_DB)
+
+
+def estimate_noise_floor(rms_envelope):
+    """以非静音帧RMS包络的低百分位估计噪声底（dBFS）"""
+    levels = _to_db(rms_envelope)
+    # 剪辑导出中常见的数字静音会把百分位拉到极低，只统计高于电平下限的帧
+    levels = levels[levels > LEVEL_FLOOR_DB]
+    if len(levels) == 0:
+        return LEVEL_FLOOR_DB
+    return float(np.percentile(levels, 10))
+
+
+def detect_speech(rms_envelope, noise_floor_db, threshold_db=SPEECH_THRESHOLD_DB, hangover_frames=SPEECH_HANGOVER_FRAMES):
+    """基于能量的人声/非人声帧标记，带拖尾保持"""
+    active = _to_db(rms_envelope) > noise_floor_db + threshold_db
+    if hangover_frames > 0 and active.any():
+        # 将每个活动帧向后延展 hangover_frames 帧
+        kernel = np.ones(hangover_frames + 1, dtype=np.int32)
+        active = np.convolve(active.astype(np.int32), kernel)[:len(active)] > 0
+    return active
+
+
+def _parse_integrated_loudness(ffmpeg_log):
+    """从ebur128滤镜的汇总日志中解析整体响度（LUFS）"""
+    matches = re.findall(r"I:\s+(-?[\d.]+|-inf)\s+LUFS", ffmpeg_log)
+    if not matches:
+        return None
+    value = matches[-1]
+    return float("-inf") if value == "-inf" else float(value)
+
+
+def analyze_audio(file_path):
+    """一次解码计算音频特征：RMS包络、整体响度、噪声底和人声分布"""
+    _require_numpy()
+    # ebur128 在原始声道上测量响度，其后的输出再转为单声道分析采样率
+    rms_envelope, total_samples, sum_squares, log = stream_rms_envelope(file_path, pre_filters="ebur128=framelog=quiet")
+    noise_floor_db = estimate_noise_floor(rms_envelope)
+    speech_map = detect_speech(rms_envelope, noise_floor_db)
+
+    integrated_loudness = _parse_integrated_loudness(log)
+    if integrated_loudness is None:
+        # 无法解析时退回为未加权的整体RMS
+        integrated_loudness = float(_to_db(np.sqrt(sum_squares / total_samples))) if total_samples else LEVEL_FLOOR_DB
+
+    return {
+        "version": ANALYSIS_VERSION,
+        "sample_rate": ANALYSIS_SAMPLE_RATE,
+        "frame_duration": FRAME_DURATION,
+        "duration": total_samples / ANALYSIS_SAMPLE_RATE,
+        "rms_envelope": rms_envelope,
+        "integrated_loudness": integrated_loudness,
+        "noise_floor_db": noise_floor_db,
+        "speech_map": speech_map,
+    }
+
+
+def _sidecar_path(cache_dir, content_hash):
+    return os.path.join(cache_dir, f"{content_hash}.v{ANALYSIS_VERSION}.npz")
+
+
+def save_analysis(analysis, sidecar_path):
+    """将分析结果保存为压缩的NumPy文件（先写临时文件再替换，避免残缺缓存）"""
+    temp_path = sidecar_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            version=np.int32(analysis["version"]),
+            sample_rate=np.int32(analysis["sample_rate"]),
+            frame_duration=np.float64(analysis["frame_duration"]),
+            duration=np.float64(analysis["duration"]),
+            rms_envelope=analysis["rms_envelope"].astype(np.float32),
+            integrated_loudness=np.float64(analysis["integrated_loudness"]),
+            noise_floor_db=np.float64(analysis["noise_floor_db"]),
+            speech_map=np.packbits(analysis["speech_map"]),
+            speech_frames=np.int64(len(analysis["speech_map"])),
+        )
+    os.replace(temp_path, sidecar_path)
+
+
+def load_analysis(sidecar_path):
+    """读取分析缓存文件"""
+    with np.load(sidecar_path) as data:
+        speech_frames = int(data["speech_frames"])
+        return {
+            "version": int(data["version"]),
+            "sample_rate": int(data["sample_rate"]),
+            "frame_duration": float(data["frame_duration"]),
+            "duration": float(data["duration"]),
+            "rms_envelope": data["rms_envelope"],
+            "integrated_loudness": float(data["integrated_loudness"]),
+            "noise_floor_db": float(data["noise_floor_db"]),
+            "speech_map": np.unpackbits(data["speech_map"])[:speech_frames].astype(bool),
+        }
+
+
+def get_audio_analysis(file_path, cache_dir, hash_index_path=None):
+    """获取音频分析结果，优先复用按内容哈希保存的缓存"""
+    _require_numpy()
+    os.makedirs(cache_dir, exist_ok=True)
+    sidecar_path = _sidecar_path(cache_dir, get_content_hash(file_path, hash_index_path))
+
+    if os.path.exists(sidecar_path):
+        try:
+            return load_analysis(sidecar_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"分析缓存损坏，重新分析: {e}")
+
+    analysis = analyze_audio(file_path)
+    try:
+        save_analysis(analysis, sidecar_path)
+    except OSError as e:
+        print(f"保存分析缓存失败: {e}")
+    return analysis
+
+
+def speech_ratio(analysis):
+    """人声帧占比"""
+    speech_map = analysis["speech_map"]
+    if len(speech_map) == 0:
+        return 0.0
+    return float(np.count_nonzero(speech_map)) / len(speech_map)
+
+
+def format_analysis_summary(analysis):
+    """分析结果的单行摘要"""
+    return (f"响度 {analysis['integrated_loudness']:.1f} LUFS, "
+            f"噪声底 {analysis['noise_floor_db']:.1f} dBFS, "
+            f"人声占比 {speech_ratio(analysis) * 100:.0f}%")
+
+
+def compute_fingerprint(file_path, duration=FINGERPRINT_DURATION):
+    """由开头一段短解码计算抽取频带能量差的二值指纹（每帧一个uint32）"""
+    _require_numpy()
+    samples, _ = decode_pcm(
+        file_path, FINGERPRINT_SAMPLE_RATE, duration=duration,
+        # 跳过前导静音，避免不同录音因开头同为静音而误判
+        pre_filters="silenceremove=start_periods=1:start_threshold=-50dB"
+    )
+    frame_count = 1 + (len(samples) - FINGERPRINT_FFT_SIZE) // FINGERPRINT_HOP_SIZE
+    if frame_count < 2:
+        return np.zeros(0, dtype=np.uint32)
+
+    index = np.arange(FINGERPRINT_FFT_SIZE)[None, :] + FINGERPRINT_HOP_SIZE * np.arange(frame_count)[:, None]
+    frames = samples[index] * np.hanning(FINGERPRINT_FFT_SIZE).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    # 将频谱抽取为对数间隔的频带能量
+    edges = np.geomspace(FINGERPRINT_MIN_FREQ, FINGERPRINT_MAX_FREQ, FINGERPRINT_BANDS + 1)
+    bins = np.round(edges * FINGERPRINT_FFT_SIZE / FINGERPRINT_SAMPLE_RATE).astype(int)
+    # 截断到最高频带上沿，否则 reduceat 的最后一个频带会一直延伸到奈奎斯特频率
+    band_energy = np.add.reduceat(power[:, :bins[-1]], bins[:-1], axis=1)
+
+    # 位 = 相邻频带能量差在时间方向上的变化符号
+    band_diff = band_energy[:, :-1] - band_energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = (1 << np.arange(FINGERPRINT_BANDS - 1, dtype=np.uint64))
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+
+def fingerprint_bit_error_rate(fingerprint_a, fingerprint_b, max_offset=FINGERPRINT_MAX_OFFSET):
+    """两个指纹在允许的帧偏移范围内的最小误码率，无法比较时返回1.0"""
+    best = 1.0
+    for offset in range(-max_offset, max_offset + 1):
+        a = fingerprint_a[max(0, offset):]
+        b = fingerprint_b[max(0, -offset):]
+        length = min(len(a), len(b))
+        if length == 0:
+            continue
+        differing = np.unpackbits((a[:length] ^ b[:length]).view(np.uint8)).sum()
+        best = min(best, differing / (length * (FINGERPRINT_BANDS - 1)))
+    return best
+
+
+def load_fingerprint_index(index_path):
+    """读取指纹索引 {快速哈希: {"duration": 秒, "fingerprint": base64}}"""
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == FINGERPRINT_VERSION:
+            return index.get("entries", {})
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"加载指纹索引时出错: {e}")
+    return {}
+
+
+def save_fingerprint_index(index_path, entries):
+    """保存指纹索引（先写临时文件再替换）"""
+    temp_path = index_path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": FINGERPRINT_VERSION, "entries": entries}, f)
+        os.replace(temp_path, index_path)
+    except IOError as e:
+        print(f"保存指纹索引时出错: {e}")
+
+
+def _duplicate_source_priority(file_path):
+    # 优先以无损格式作为代表文件
+    extension = os.path.splitext(file_path)[1].lower()
+    return 0 if extension in (".wav", ".flac") else 1
+
+
+def find_duplicate_groups(file_paths, cache_dir, hash_index_path=None):
+    """按音频指纹将重复的录音分组
+
+    返回 [(代表文件, [(别名文件, 误码率), ...]), ...]，顺序与输入一致。代表文件优先选择无损格式，
+    内容完全相同的别名误码率为0。
+    指纹按快速哈希（文件开头4MB + 大小）保存在 cache_dir 下的索引中，后续运行直接复用。
+    只有大小和快速哈希都相同的文件才计算完整内容哈希，确认是否完全相同。
+    """
+    from audio_processor import get_audio_duration
+
+    _require_numpy()
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, "fingerprint_index.json")
+    entries = load_fingerprint_index(index_path)
+    index_changed = False
+
+    fingerprints = {}
+    for file_path in file_paths:
+        quick_hash = compute_quick_hash(file_path)
+        entry = entries.get(quick_hash)
+        if entry is None:
+            fingerprint = compute_fingerprint(file_path)
+            entry = {
+                "duration": get_audio_duration(file_path),
+                "fingerprint": base64.b64encode(fingerprint.tobytes()).decode("ascii"),
+            }
+            entries[quick_hash] = entry
+            index_changed = True
+        fingerprints[file_path] = (
+            quick_hash,
+            entry["duration"],
+            np.frombuffer(base64.b64decode(entry["fingerprint"]), dtype=np.uint32),
+        )
+
+    if index_changed:
+        save_fingerprint_index(index_path, entries)
+
+    groups = []
+    for file_path in sorted(file_paths, key=_duplicate_source_priority):
+        quick_hash, duration, fingerprint = fingerprints[file_path]
+        for group in groups:
+            group_hash, group_duration, group_fingerprint = fingerprints[group[0][0]]
+            # 快速哈希包含文件大小，相同时再比较完整内容哈希
+            if (quick_hash == group_hash and get_content_hash(file_path, hash_index_path)
+                    == get_content_hash(group[0][0], hash_index_path)):
+                group.append((file_path, 0.0))
+                break
+            if (abs(duration - group_duration) <= DUPLICATE_DURATION_TOLERANCE
+                    and len(fingerprint) > 0 and len(group_fingerprint) > 0):
+                bit_error_rate = fingerprint_bit_error_rate(fingerprint, group_fingerprint)
+                if bit_error_rate < DUPLICATE_BER_THRESHOLD:
+                    group.append((file_path, float(bit_error_rate)))
+                    break
+        else:
+            groups.append([(file_path, 0.0)])
+
+    # 按输入顺序排列各组
+    order = {file_path: i for i, file_path in enumerate(file_paths)}
+    groups.sort(key=lambda group: min(order[file_path] for file_path, _ in group))
+    return [(group[0][0], group[1:]) for group in groups]
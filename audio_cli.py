@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+音频分割工具命令行入口（无界面批量处理）
+"""
+
+import os
+import sys
+import argparse
+
+from audio_processor import (process_audio_file, check_ffmpeg_available, list_audio_files, resolve_batch_tier,
+                             link_segment_files, SUPPORTED_FORMATS, PROCESSING_TIERS, AUTO_TIER,
+                             DEFAULT_PROCESSING_TIER)
+from audio_analysis import find_duplicate_groups, get_audio_analysis, format_analysis_summary, save_content_hashes
+from audio_pack import pack_audio_file
+from config_manager import ConfigManager
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="按时长批量分割音频文件")
+    parser.add_argument("audio_folder", help="音频文件夹")
+    parser.add_argument("-d", "--duration", type=int, default=30, help="分割时长（秒），默认30")
+    parser.add_argument("-o", "--output", help="输出文件夹，默认为 <音频文件夹>/split_audio")
+    parser.add_argument("-f", "--format", dest="formats", action="append", choices=list(SUPPORTED_FORMATS),
+                        help="输出格式，可重复指定以同时输出多种格式，默认WAV")
+    parser.add_argument("-t", "--transition-sound", help="过渡音效文件")
+    parser.add_argument("--tier", choices=list(PROCESSING_TIERS) + [AUTO_TIER], default=DEFAULT_PROCESSING_TIER,
+                        help="清理链处理档位，auto 按目标实时率自动选择，默认best")
+    parser.add_argument("--target-rtf", type=float, default=0.1,
+                        help="auto档位的目标实时率（处理耗时 / 音频时长），默认0.1")
+    parser.add_argument("--analyze", action="store_true",
+                        help="分析源文件特征（响度、噪声底、人声分布），结果按内容哈希缓存")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="通过音频指纹识别重复录音，每个录音只处理一次，其余文件复用片段")
+    parser.add_argument("--pack", action="store_true",
+                        help="每个输入打包为一个WAV容器和片段索引（忽略 --format）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.duration <= 0:
+        print("分割时长必须大于0")
+        return 1
+    if args.tier == AUTO_TIER and args.target_rtf <= 0:
+        print("目标实时率必须大于0")
+        return 1
+    if not check_ffmpeg_available():
+        print("未找到 ffmpeg，请确保已安装并添加到系统路径")
+        return 1
+
+    audio_files = list_audio_files(args.audio_folder)
+    if not audio_files:
+        print("未找到音频文件")
+        return 1
+    print(f"找到 {len(audio_files)} 个音频文件")
+
+    output_folder = args.output or os.path.join(args.audio_folder, "split_audio")
+    os.makedirs(output_folder, exist_ok=True)
+    output_formats = ["WAV"] if args.pack else (args.formats or ["WAV"])
+    output_format = output_formats if len(output_formats) > 1 else output_formats[0]
+
+    # 确定本批次的处理档位
+    try:
+        processing_tier, tier_costs = resolve_batch_tier(
+            os.path.join(args.audio_folder, audio_files[0]), args.tier, args.target_rtf,
+            os.path.join(output_folder, "temp_benchmark"))
+    except Exception as e:
+        print(f"警告: 档位开销测量失败，使用默认档位 {DEFAULT_PROCESSING_TIER}: {str(e)}")
+        processing_tier, tier_costs = DEFAULT_PROCESSING_TIER, None
+    if tier_costs:
+        costs_text = ", ".join(f"{tier} {cost:.3f}" for tier, cost in tier_costs.items())
+        print(f"档位实测实时率: {costs_text}")
+    print(f"处理档位: {processing_tier}")
+
+    config_manager = ConfigManager()
+    hash_index_path = str(config_manager.get_hash_index_path())
+
+    # 按音频指纹分组重复录音，每组只处理一次
+    duplicate_groups = [(filename, []) for filename in audio_files]
+    if args.skip_duplicates and len(audio_files) > 1:
+        try:
+            groups = find_duplicate_groups([os.path.join(args.audio_folder, f) for f in audio_files],
+                                           str(config_manager.get_cache_dir("fingerprints")), hash_index_path)
+            duplicate_groups = []
+            for source, aliases in groups:
+                for alias, bit_error_rate in aliases:
+                    print(f"重复录音: {os.path.basename(alias)} 与 {os.path.basename(source)} 相同"
+                          f"（指纹误码率 {bit_error_rate:.3f}），将复用其片段")
+                duplicate_groups.append((os.path.basename(source), [os.path.basename(a) for a, _ in aliases]))
+        except Exception as e:
+            print(f"重复录音识别跳过: {str(e)}")
+
+    failed = 0
+    for i, (filename, aliases) in enumerate(duplicate_groups):
+        print(f"正在处理: {filename} ({i+1}/{len(duplicate_groups)})")
+        input_path = os.path.join(args.audio_folder, filename)
+        file_base_name = os.path.splitext(filename)[0]
+        if args.analyze:
+            try:
+                analysis = get_audio_analysis(input_path, str(config_manager.get_cache_dir("analysis")), hash_index_path)
+                print(f"  音频分析: {format_analysis_summary(analysis)}")
+            except Exception as e:
+                print(f"  音频分析跳过: {str(e)}")
+        try:
+            if args.pack:
+                segments, segment_count = pack_audio_file(input_path, output_folder, file_base_name, args.duration,
+                                                          args.transition_sound, processing_tier)
+            else:
+                segments = process_audio_file(input_path, output_folder, file_base_name, args.duration,
+                                              output_format, args.transition_sound, processing_tier)
+                segment_count = len(segments) if isinstance(segments, list) else len(segments[output_formats[0]])
+            print(f"  完成分割: {filename} -> {segment_count} 个片段 ({', '.join(output_formats)})")
+            for alias in aliases:
+                link_segment_files(segments, file_base_name, os.path.splitext(alias)[0])
+                print(f"  复用片段: {alias} -> {segment_count} 个片段")
+        except Exception as e:
+            failed += 1
+            print(f"处理 {filename} 时出错: {str(e)}")
+
+    if args.analyze or args.skip_duplicates:
+        save_content_hashes(hash_index_path)
+
+    print(f"输出文件保存在: {output_folder}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
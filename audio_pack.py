@@ -0,0 +1,157 @@
+import os
+import json
+import wave
+import shutil
+import struct
+import tempfile
+
+from audio_processor import process_audio_file
+
+
+# 打包输出：每个输入只生成一个WAV容器（带cue标记）和一个JSON片段索引
+PACK_VERSION = 1
+PACK_EXTENSION = ".pack.wav"
+PACK_INDEX_EXTENSION = ".pack.json"
+PACK_DATA_OFFSET = 44  # RIFF头 + fmt块 + data块头，片段数据从此处开始
+MAX_RIFF_SIZE = 0xFFFFFFFF
+
+
+def get_pack_paths(output_folder, file_base_name):
+    """返回 (打包文件路径, 索引文件路径)"""
+    return (os.path.join(output_folder, file_base_name + PACK_EXTENSION),
+            os.path.join(output_folder, file_base_name + PACK_INDEX_EXTENSION))
+
+
+def _wav_header(channels, sample_width, sample_rate, data_size, riff_size):
+    block_align = channels * sample_width
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate,
+                                sample_rate * block_align, block_align, sample_width * 8)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+def _cue_chunk(start_frames):
+    """生成cue块，每个片段起点一个标记（位置单位为采样帧）"""
+    points = b"".join(
+        struct.pack("<II4sIII", i + 1, start, b"data", 0, 0, start)
+        for i, start in enumerate(start_frames)
+    )
+    return b"cue " + struct.pack("<II", 4 + len(points), len(start_frames)) + points
+
+
+def write_pack(segment_files, pack_path, index_path):
+    """将片段WAV依次写入一个连续的WAV容器，并生成片段索引
+
+    写入前根据各片段的帧数检查4GB上限；写入失败时删除临时文件。
+    """
+    params = None
+    segments = []
+    total_frames = 0
+    for segment_file in segment_files:
+        with wave.open(segment_file, "rb") as w:
+            current = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+            frame_count = w.getnframes()
+        if params is None:
+            params = current
+        elif current != params:
+            raise Exception(f"片段音频参数不一致，无法打包: {segment_file}")
+        segments.append({"number": len(segments) + 1, "start_frame": total_frames, "frame_count": frame_count})
+        total_frames += frame_count
+
+    if params is None:
+        raise Exception("没有可打包的片段")
+    channels, sample_width, sample_rate = params
+    data_size = total_frames * channels * sample_width
+    cue = _cue_chunk([segment["start_frame"] for segment in segments])
+    riff_size = PACK_DATA_OFFSET - 8 + data_size + data_size % 2 + len(cue)
+    if riff_size > MAX_RIFF_SIZE:
+        raise Exception("打包文件超过WAV格式4GB上限")
+
+    index = {
+        "version": PACK_VERSION,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "sample_width": sample_width,
+        "data_offset": PACK_DATA_OFFSET,
+        "segments": segments,
+    }
+    temp_path = pack_path + ".tmp"
+    temp_index_path = index_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as out:
+            out.write(_wav_header(channels, sample_width, sample_rate, data_size, riff_size))
+            for segment_file, segment in zip(segment_files, segments):
+                with wave.open(segment_file, "rb") as w:
+                    out.write(w.readframes(segment["frame_count"]))
+            if data_size % 2:
+                out.write(b"\0")  # RIFF块按偶数字节对齐
+            out.write(cue)
+
+        with open(temp_index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+
+        os.replace(temp_path, pack_path)
+        os.replace(temp_index_path, index_path)
+    except Exception:
+        for path in (temp_path, temp_index_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return index
+
+
+def pack_audio_file(input_path, output_folder, file_base_name, segment_duration, transition_sound_path=None, processing_tier="best"):
+    """处理单个音频文件并打包输出，返回 ([打包文件, 索引文件], 片段数)
+
+    片段先在本地临时目录中生成，输出目录只写入两个文件。打包格式固定为WAV，便于按偏移直接读取。
+    """
+    work_folder = tempfile.mkdtemp(prefix="audiosplitter_pack_")
+    try:
+        segment_files = process_audio_file(input_path, work_folder, file_base_name, segment_duration,
+                                           "WAV", transition_sound_path, processing_tier)
+        pack_path, index_path = get_pack_paths(output_folder, file_base_name)
+        index = write_pack(segment_files, pack_path, index_path)
+        return [pack_path, index_path], len(index["segments"])
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+
+def load_pack_index(pack_path):
+    """读取打包文件对应的片段索引"""
+    if not pack_path.endswith(PACK_EXTENSION):
+        raise Exception(f"不是打包文件: {pack_path}")
+    index_path = pack_path[:-len(PACK_EXTENSION)] + PACK_INDEX_EXTENSION
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        raise Exception(f"无法读取打包索引: {str(e)}")
+    if index.get("version") != PACK_VERSION:
+        raise Exception(f"不支持的打包索引版本: {index.get('version')}")
+    return index
+
+
+def read_pack_segment(pack_path, segment_number, index=None):
+    """按序号（从1开始）读取片段的PCM数据，只需一次seek"""
+    index = index or load_pack_index(pack_path)
+    if not 1 <= segment_number <= len(index["segments"]):
+        raise Exception(f"片段序号超出范围: {segment_number}")
+    segment = index["segments"][segment_number - 1]
+    block_align = index["channels"] * index["sample_width"]
+    with open(pack_path, "rb") as f:
+        f.seek(index["data_offset"] + segment["start_frame"] * block_align)
+        return f.read(segment["frame_count"] * block_align)
+
+
+def extract_pack_segment(pack_path, segment_number, output_path, index=None):
+    """将打包文件中的一个片段导出为独立的WAV文件"""
+    index = index or load_pack_index(pack_path)
+    frames = read_pack_segment(pack_path, segment_number, index)
+    with wave.open(output_path, "wb") as w:
+        w.setnchannels(index["channels"])
+        w.setsampwidth(index["sample_width"])
+        w.setframerate(index["sample_rate"])
+        w.writeframes(frames)
+    return output_path
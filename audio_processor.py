@@ -3,6 +3,7 @@ import subprocess
 import re
 import platform
 import json
+import time
 
 
 # 支持的音频格式
@@ -45,89 +46,125 @@ def get_audio_channels(file_path):
         return 1
 
 
-def remove_silence_advanced(input_path, output_path):
-    """使用专业方法去除非人声部分（静音检测）"""
+# 清理链处理档位：按质量从低到高排列
+PROCESSING_TIERS = {
+    "fast": {
+        "label": "快速",
+        # 仅做频段滤波，不做对比度增强和频域降噪
+        "filters": ["highpass=f=200", "lowpass=f=3000"]
+    },
+    "balanced": {
+        "label": "均衡",
+        # 降采样到22.05kHz后再降噪（低通3.5kHz以上无有效内容），降噪开销约减半
+        "filters": ["aresample=22050", "highpass=f=150", "lowpass=f=3500", "acontrast=60", "afftdn=nr=20"]
+    },
+    "best": {
+        "label": "最佳",
+        "filters": [
+            # 信号增强：突出人声频段特征(200Hz-3kHz)
+            "highpass=f=200",  # 去除200Hz以下的低频噪声
+            "lowpass=f=3000",  # 去除3000Hz以上的高频噪声
+            "acontrast=75",  # 提升人声频段的信号对比度
+            # 降噪提纯：去除残留非人声杂音
+            "afftdn=nr=30"  # 频域降噪，nr为降噪强度
+        ]
+    }
+}
+
+# 自动选择档位时使用的名称
+AUTO_TIER = "auto"
+DEFAULT_PROCESSING_TIER = "best"
+# 测量档位开销时截取的音频时长（秒）
+TIER_BENCHMARK_DURATION = 10
+
+
+def build_clean_filters(tier, channels):
+    """根据处理档位和声道数构建清理滤镜链"""
+    if tier not in PROCESSING_TIERS:
+        raise Exception(f"未知的处理档位: {tier}")
+    filters = list(PROCESSING_TIERS[tier]["filters"])
+    if channels != 1:
+        # 声道优化：将立体声转为单声道并混合左右声道的人声信号
+        filters.insert(0, "pan=mono|c0=0.5*c0+0.5*c1")
+    return ",".join(filters)
+
+
+def remove_silence_advanced(input_path, output_path, tier=DEFAULT_PROCESSING_TIER, duration=None, fallback=True):
+    """使用专业方法去除非人声部分（静音检测）
+    
+    tier 为处理档位（fast / balanced / best），失败时依次回退到更轻的档位，
+    全部失败则直接转码复制。duration 用于只处理开头一段（测量档位开销）。
+    fallback 为False时只运行指定档位，失败直接抛出异常。
+    """
+    # 首先检查音频是否为立体声
+    channels = get_audio_channels(input_path)
+    tier_names = list(PROCESSING_TIERS)
+    fallback_tiers = tier_names[:tier_names.index(tier) + 1][::-1] if tier in PROCESSING_TIERS else [tier]
+    if not fallback:
+        fallback_tiers = [tier]
+    limit = ["-t", str(duration)] if duration is not None else []
+    
+    for current_tier in fallback_tiers:
+        cmd = [
+            "ffmpeg", "-y", "-i", input_path, *limit,
+            "-af", build_clean_filters(current_tier, channels),
+            "-c:a", "pcm_s16le", "-ar", "44100",
+            output_path
+        ]
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+            return output_path
+        except subprocess.CalledProcessError as e:
+            if not fallback:
+                raise Exception(f"处理档位 {current_tier} 运行失败: {str(e)}")
+            print(f"去除非人声部分失败（{current_tier}），尝试备用方案: {e}")
+    
+    # 如果仍然失败，就直接复制文件
     try:
-        # 首先检查音频是否为立体声
-        channels = get_audio_channels(input_path)
-        
-        if channels == 1:
-            # 单声道音频 - 直接应用滤镜链
-            cmd = [
-                "ffmpeg", "-y", "-i", input_path,
-                "-af", 
-                # 信号增强：突出人声频段特征(200Hz-3kHz)
-                "highpass=f=200,"  # 去除200Hz以下的低频噪声
-                "lowpass=f=3000,"  # 去除3000Hz以上的高频噪声
-                "acontrast=75,"  # 提升人声频段的信号对比度
-                # 降噪提纯：去除残留非人声杂音
-                "afftdn=nr=30",  # 频域降噪，nr为降噪强度
-                "-c:a", "pcm_s16le", "-ar", "44100",
-                output_path
-            ]
-        else:
-            # 立体声或多声道音频 - 使用声道优化
-            cmd = [
-                "ffmpeg", "-y", "-i", input_path,
-                "-af", 
-                # 声道优化：将立体声转为单声道并混合人声信号
-                "pan=mono|c0=0.5*c0+0.5*c1,"  # 立体声转单声道并混合左右声道
-                # 信号增强：突出人声频段特征(200Hz-3kHz)
-                "highpass=f=200,"  # 去除200Hz以下的低频噪声
-                "lowpass=f=3000,"  # 去除3000Hz以上的高频噪声
-                "acontrast=75,"  # 提升人声频段的信号对比度
-                # 降噪提纯：去除残留非人声杂音
-                "afftdn=nr=30",  # 频域降噪，nr为降噪强度
-                "-c:a", "pcm_s16le", "-ar", "44100",
-                output_path
-            ]
-        
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        cmd = [
+            "ffmpeg", "-y", "-i", input_path, *limit,
+            "-c:a", "pcm_s16le", "-ar", "44100",
+            output_path
+        ]
+        subprocess.run(cmd, check=True, capture_output=True)
         return output_path
     except subprocess.CalledProcessError as e:
-        print(f"去除非人声部分失败，尝试备用方案: {e}")
-        # 如果高级处理失败，尝试使用标准参数
+        raise Exception(f"处理音频失败: {str(e)}")
+
+
+def measure_tier_costs(sample_path, temp_folder, duration=TIER_BENCHMARK_DURATION):
+    """在样本音频开头一段上实测各档位的实时率（处理耗时 / 音频时长，越小越快）
+
+    测量时不回退到其他档位，运行失败的档位不计入结果。
+    """
+    os.makedirs(temp_folder, exist_ok=True)
+    sample_duration = min(duration, get_audio_duration(sample_path))
+    if sample_duration <= 0:
+        raise Exception("样本音频时长为0，无法测量处理开销")
+    
+    costs = {}
+    for tier in PROCESSING_TIERS:
+        output_path = os.path.join(temp_folder, f"tier_benchmark_{tier}.wav")
+        start = time.perf_counter()
         try:
-            channels = get_audio_channels(input_path)  # 重新获取声道数
-            
-            if channels == 1:
-                cmd = [
-                    "ffmpeg", "-y", "-i", input_path,
-                    "-af", 
-                    "highpass=f=150,"  # 轻度声道优化
-                    "lowpass=f=3500,"  # 轻度频段优化
-                    "acontrast=60,"  # 轻度信号增强
-                    "afftdn=nr=20",  # 轻度降噪
-                    "-c:a", "pcm_s16le", "-ar", "44100",
-                    output_path
-                ]
-            else:
-                cmd = [
-                    "ffmpeg", "-y", "-i", input_path,
-                    "-af", 
-                    "pan=mono|c0=0.5*c0+0.5*c1,"  # 声道优化
-                    "highpass=f=150,"  # 轻度声道优化
-                    "lowpass=f=3500,"  # 轻度频段优化
-                    "acontrast=60,"  # 轻度信号增强
-                    "afftdn=nr=20",  # 轻度降噪
-                    "-c:a", "pcm_s16le", "-ar", "44100",
-                    output_path
-                ]
-            subprocess.run(cmd, check=True, capture_output=True)
-            return output_path
-        except subprocess.CalledProcessError as e2:
-            print(f"备用方案也失败，直接复制文件: {e2}")
-            # 如果仍然失败，就直接复制文件
-            try:
-                cmd = [
-                    "ffmpeg", "-y", "-i", input_path,
-                    "-c:a", "pcm_s16le", "-ar", "44100",
-                    output_path
-                ]
-                subprocess.run(cmd, check=True, capture_output=True)
-                return output_path
-            except subprocess.CalledProcessError as e3:
-                raise Exception(f"处理音频失败: {str(e3)}")
+            remove_silence_advanced(sample_path, output_path, tier, duration=sample_duration, fallback=False)
+            costs[tier] = (time.perf_counter() - start) / sample_duration
+        except Exception as e:
+            print(f"档位 {tier} 测量失败，不参与选择: {str(e)}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    if not costs:
+        raise Exception("所有处理档位均运行失败，无法测量处理开销")
+    return costs
+
+
+def select_processing_tier(tier_costs, target_rtf):
+    """选择实时率不超过目标的最高质量档位，都不满足时使用最快档位"""
+    chosen = min(tier_costs, key=tier_costs.get)
+    for tier in PROCESSING_TIERS:
+        if tier in tier_costs and tier_costs[tier] <= target_rtf:
+            chosen = tier
+    return chosen
 
 
 def sophisticated_end_effect(input_path, output_path, transition_sound_path=None):
@@ -204,6 +241,42 @@ def sophisticated_end_effect(input_path, output_path, transition_sound_path=None
                 raise Exception(f"应用结束效果失败: {str(e3)}")
 
 
+def render_preview(input_path, output_path, segment_duration, segment_index=0, transition_sound_path=None, processing_tier=DEFAULT_PROCESSING_TIER):
+    """快速渲染单个片段的试听文件
+    
+    只在输入端seek到目标片段并解码该窗口，清理链与结束效果在同一条ffmpeg命令中完成。
+    由于只对窗口做降噪，结果与整文件处理后的片段可能存在细微差异。
+    """
+    total_duration = get_audio_duration(input_path)
+    start_time = segment_index * segment_duration
+    if start_time + segment_duration > total_duration:
+        raise Exception(f"音频时长不足，无法试听第{segment_index + 1}个片段")
+    
+    clean_filters = build_clean_filters(processing_tier, get_audio_channels(input_path))
+    cmd = ["ffmpeg", "-y", "-ss", str(start_time), "-t", str(segment_duration), "-i", input_path]
+    
+    if transition_sound_path and os.path.exists(transition_sound_path):
+        # 与 sophisticated_end_effect 相同：混合过渡音效并在最后0.2秒淡出
+        fade_start = max(0, segment_duration - 0.2)
+        cmd.extend([
+            "-i", transition_sound_path,
+            "-filter_complex",
+            f"[0:a]{clean_filters}[clean];"
+            f"[clean][1:a]amix=inputs=2:duration=first:dropout_transition=0.1,"
+            f"afade=t=out:st={fade_start}:d=0.2"
+        ])
+    else:
+        fade_start = max(0, segment_duration - 0.1)
+        cmd.extend(["-af", f"{clean_filters},afade=t=out:st={fade_start}:d=0.1"])
+    
+    cmd.extend(["-c:a", "pcm_s16le", "-ar", "44100", output_path])
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"渲染试听片段失败: {str(e)}")
+    return output_path
+
+
 def get_ffmpeg_codec_params(output_format):
     """根据输出格式获取FFmpeg编码参数"""
     codec_params = {
@@ -217,9 +290,35 @@ def get_ffmpeg_codec_params(output_format):
     return codec_params.get(output_format, ["-c:a", "pcm_s16le"])
 
 
+def normalize_output_formats(output_format):
+    """将单个格式或格式列表统一为去重后的格式列表"""
+    if isinstance(output_format, str):
+        formats = [output_format]
+    else:
+        formats = list(output_format)
+    
+    normalized = []
+    for fmt in formats:
+        fmt = fmt.upper()
+        if fmt not in SUPPORTED_FORMATS:
+            raise Exception(f"不支持的输出格式: {fmt}")
+        if fmt not in normalized:
+            normalized.append(fmt)
+    
+    if not normalized:
+        raise Exception("至少需要指定一种输出格式")
+    return normalized
+
+
 def split_audio_with_fade(input_path, output_folder, file_base_name, segment_duration, output_format="WAV", transition_sound_path=None):
-    """按指定时长分割音频，并对每个片段进行高级平滑结束处理"""
+    """按指定时长分割音频，并对每个片段进行高级平滑结束处理
+    
+    output_format 可以是单个格式，也可以是格式列表。每个片段只提取并应用结束效果一次，
+    得到的PCM再由同一条ffmpeg命令编码为所有格式；传入列表时返回 {格式: 片段文件列表}。
+    """
     try:
+        output_formats = normalize_output_formats(output_format)
+        
         # 获取音频总时长
         total_duration = get_audio_duration(input_path)
         
@@ -229,41 +328,54 @@ def split_audio_with_fade(input_path, output_folder, file_base_name, segment_dur
         if full_segments == 0:
             raise Exception("音频时长不足一个分割片段")
         
-        # 获取文件扩展名
-        file_extension = SUPPORTED_FORMATS.get(output_format, ".wav")
-        
-        # 创建临时文件列表用于拼接
-        segment_files = []
+        # 每种格式对应的片段文件列表
+        segment_files = {fmt: [] for fmt in output_formats}
         
         # 分割音频并应用高级平滑结束处理
         for i in range(full_segments):
             start_time = i * segment_duration
-            output_file = os.path.join(output_folder, f"{file_base_name}_part{i+1:03d}{file_extension}")
+            segment_name = f"{file_base_name}_part{i+1:03d}"
+            raw_file = os.path.join(output_folder, f"{segment_name}_raw.wav")
+            finished_file = os.path.join(output_folder, f"{segment_name}_temp.wav")
             
-            # 提取音频片段（不使用-t参数，避免截断问题）
+            # 提取音频片段（-ss/-t 作为输入选项，只解码该窗口）
             cmd = [
-                "ffmpeg", "-y", "-ss", str(start_time), "-i", input_path,
-                "-t", str(segment_duration)
+                "ffmpeg", "-y", "-ss", str(start_time), "-t", str(segment_duration), "-i", input_path,
+                "-c:a", "pcm_s16le", raw_file
             ]
-            
-            # 添加编码参数
-            cmd.extend(get_ffmpeg_codec_params(output_format))
-            cmd.append(output_file)
-            
             subprocess.run(cmd, check=True, capture_output=True)
             
-            # 应用高级"自然结束"效果（仅对WAV格式，其他格式直接使用）
-            if output_format == "WAV":
-                temp_file = output_file.replace(".wav", "_temp.wav")
-                os.rename(output_file, temp_file)
-                sophisticated_end_effect(temp_file, output_file, transition_sound_path)  # 自然结束效果
+            try:
+                # 应用高级"自然结束"效果，所有格式共用同一份成品PCM
+                sophisticated_end_effect(raw_file, finished_file, transition_sound_path)
+                
+                output_files = {fmt: os.path.join(output_folder, segment_name + SUPPORTED_FORMATS[fmt])
+                                for fmt in output_formats}
+                encode_formats = [fmt for fmt in output_formats if fmt != "WAV"]
                 
+                # 单次解码成品PCM，多路编码输出
+                if encode_formats:
+                    cmd = ["ffmpeg", "-y", "-i", finished_file]
+                    for fmt in encode_formats:
+                        cmd.extend(["-map", "0:a"])
+                        cmd.extend(get_ffmpeg_codec_params(fmt))
+                        cmd.append(output_files[fmt])
+                    subprocess.run(cmd, check=True, capture_output=True)
+                
+                # WAV 即成品PCM本身，直接改名
+                if "WAV" in output_files:
+                    os.replace(finished_file, output_files["WAV"])
+            finally:
                 # 删除临时文件
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
+                for temp_file in (raw_file, finished_file):
+                    if os.path.exists(temp_file):
+                        os.remove(temp_file)
             
-            segment_files.append(output_file)
+            for fmt, output_file in output_files.items():
+                segment_files[fmt].append(output_file)
         
+        if isinstance(output_format, str):
+            return segment_files[output_formats[0]]
         return segment_files
     
     except subprocess.CalledProcessError as e:
@@ -326,8 +438,11 @@ def crossfade_segments(segments, output_folder, file_base_name, crossfade_durati
         raise Exception(f"应用交叉淡入淡出效果失败: {str(e)}")
 
 
-def process_audio_file(input_path, output_folder, file_base_name, segment_duration, output_format="WAV", transition_sound_path=None):
-    """处理单个音频文件的完整流程"""
+def process_audio_file(input_path, output_folder, file_base_name, segment_duration, output_format="WAV", transition_sound_path=None, processing_tier=DEFAULT_PROCESSING_TIER):
+    """处理单个音频文件的完整流程
+    
+    output_format 为格式列表时，去除非人声和分割只执行一次，返回 {格式: 片段文件列表}。
+    """
     try:
         # 步骤1: 创建临时文件用于去除非人声部分
         temp_folder = os.path.join(output_folder, "temp")
@@ -335,7 +450,7 @@ def process_audio_file(input_path, output_folder, file_base_name, segment_durati
         cleaned_audio = os.path.join(temp_folder, f"{file_base_name}_clean.wav")
         
         # 步骤2: 使用高级方法去除非人声部分
-        remove_silence_advanced(input_path, cleaned_audio)
+        remove_silence_advanced(input_path, cleaned_audio, processing_tier)
         
         # 步骤3: 分割音频并应用高级平滑结束处理
         segments = split_audio_with_fade(cleaned_audio, output_folder, file_base_name, segment_duration, output_format, transition_sound_path)
@@ -363,6 +478,51 @@ def process_audio_file(input_path, output_folder, file_base_name, segment_durati
         raise e
 
 
+def link_segment_files(segments, file_base_name, alias_base_name):
+    """为重复录音的别名生成片段文件：优先硬链接，不支持时复制
+    
+    segments 为 process_audio_file 的返回值（列表或 {格式: 列表}），返回结构相同。
+    """
+    import shutil
+    
+    if alias_base_name == file_base_name:
+        # 同名不同容器（如 a.m4a 与 a.wav），片段已存在
+        return segments
+    
+    def link_one(segment_file):
+        folder, filename = os.path.split(segment_file)
+        alias_file = os.path.join(folder, alias_base_name + filename[len(file_base_name):])
+        if os.path.exists(alias_file):
+            os.remove(alias_file)
+        try:
+            os.link(segment_file, alias_file)
+        except OSError:
+            shutil.copy2(segment_file, alias_file)
+        return alias_file
+    
+    if isinstance(segments, dict):
+        return {fmt: [link_one(f) for f in files] for fmt, files in segments.items()}
+    return [link_one(f) for f in segments]
+
+
+def list_audio_files(folder_path):
+    """列出文件夹中所有支持的音频文件名"""
+    return [file for file in os.listdir(folder_path)
+            if file.lower().endswith(tuple(SUPPORTED_FORMATS.values()))]
+
+
+def resolve_batch_tier(sample_path, processing_tier, target_rtf, temp_folder):
+    """确定本批次使用的处理档位，返回 (档位, 实测开销)；非自动模式时实测开销为None"""
+    if processing_tier != AUTO_TIER:
+        return processing_tier, None
+    try:
+        tier_costs = measure_tier_costs(sample_path, temp_folder)
+    finally:
+        import shutil
+        shutil.rmtree(temp_folder, ignore_errors=True)
+    return select_processing_tier(tier_costs, target_rtf), tier_costs
+
+
 def check_ffmpeg_available():
     """检查ffmpeg是否可用"""
     try:
@@ -5,7 +5,11 @@ import subprocess
 import threading
 import webbrowser
 import platform
-from audio_processor import process_audio_file, check_ffmpeg_available, SUPPORTED_FORMATS
+import time
+from audio_processor import (process_audio_file, check_ffmpeg_available, list_audio_files, resolve_batch_tier,
+                             render_preview, link_segment_files, SUPPORTED_FORMATS, PROCESSING_TIERS, AUTO_TIER, DEFAULT_PROCESSING_TIER)
+from audio_analysis import get_audio_analysis, format_analysis_summary, find_duplicate_groups, save_content_hashes
+from audio_pack import pack_audio_file
 from config_manager import ConfigManager
 
 
@@ -30,8 +34,26 @@ class AudioSplitterApp:
         self.output_folder = tk.StringVar(value=self.config_manager.get("output_folder", ""))
         # 输出格式
         self.output_format = tk.StringVar(value=self.config_manager.get("output_format", "WAV"))
+        # 附加输出格式（同一次处理中同时输出）
+        extra_formats = self.config_manager.get("extra_output_formats", [])
+        self.extra_output_formats = {fmt: tk.BooleanVar(value=fmt in extra_formats) for fmt in SUPPORTED_FORMATS}
         # 过渡音效文件路径
         self.transition_sound = tk.StringVar(value=self.config_manager.get("transition_sound", ""))
+        # 处理档位（界面显示中文名称）
+        self.tier_labels = {tier: info["label"] for tier, info in PROCESSING_TIERS.items()}
+        self.tier_labels[AUTO_TIER] = "自动"
+        self.processing_tier = tk.StringVar(value=self.tier_labels.get(self.config_manager.get("processing_tier", "best"), "最佳"))
+        # 自动档位的目标实时率
+        self.target_rtf = tk.DoubleVar(value=self.config_manager.get("target_rtf", 0.1))
+        # 音频分析（可选）
+        self.analyze_audio = tk.BooleanVar(value=self.config_manager.get("analyze_audio", False))
+        # 跳过重复录音
+        self.skip_duplicates = tk.BooleanVar(value=self.config_manager.get("skip_duplicates", False))
+        # 打包输出
+        self.pack_output = tk.BooleanVar(value=self.config_manager.get("pack_output", False))
+        # 试听片段序号（从1开始）
+        self.preview_segment = tk.IntVar(value=1)
+        self.preview_count = 0
         # 进度变量
         self.progress_var = tk.DoubleVar()
         self.status_var = tk.StringVar(value="就绪")
@@ -54,7 +76,13 @@ class AudioSplitterApp:
             "advanced_processing": self.advanced_processing.get(),
             "output_folder": self.output_folder.get(),
             "output_format": self.output_format.get(),
+            "extra_output_formats": [fmt for fmt, var in self.extra_output_formats.items() if var.get()],
             "transition_sound": self.transition_sound.get(),
+            "processing_tier": self.get_processing_tier(),
+            "target_rtf": self.target_rtf.get(),
+            "analyze_audio": self.analyze_audio.get(),
+            "skip_duplicates": self.skip_duplicates.get(),
+            "pack_output": self.pack_output.get(),
             "window_geometry": self.root.geometry()
         }
         self.config_manager.update(config_updates)
@@ -94,9 +122,17 @@ class AudioSplitterApp:
         
         # 输出格式选择
         ttk.Label(main_frame, text="输出格式:").grid(row=2, column=0, sticky="w", pady=5)
-        format_combo = ttk.Combobox(main_frame, textvariable=self.output_format, 
+        format_frame = ttk.Frame(main_frame)
+        format_frame.grid(row=2, column=1, columnspan=2, sticky="w", pady=5)
+        
+        format_combo = ttk.Combobox(format_frame, textvariable=self.output_format, 
                                    values=list(SUPPORTED_FORMATS.keys()), state="readonly", width=15)
-        format_combo.grid(row=2, column=1, sticky="w", pady=5)
+        format_combo.grid(row=0, column=0, padx=(0, 10))
+        
+        # 附加输出格式（一次解码同时输出多种格式）
+        ttk.Label(format_frame, text="附加:").grid(row=0, column=1)
+        for col, (fmt, var) in enumerate(self.extra_output_formats.items(), start=2):
+            ttk.Checkbutton(format_frame, text=fmt, variable=var).grid(row=0, column=col)
         
         # 过渡音效文件选择
         ttk.Label(main_frame, text="过渡音效:").grid(row=3, column=0, sticky="w", pady=5)
@@ -108,7 +144,19 @@ class AudioSplitterApp:
         ttk.Button(transition_frame, text="浏览", command=self.browse_transition_sound).grid(row=0, column=1)
         
         # 高级处理选项
-        ttk.Checkbutton(main_frame, text="启用高级音频处理", variable=self.advanced_processing).grid(row=4, column=0, columnspan=3, sticky="w", pady=5)
+        advanced_frame = ttk.Frame(main_frame)
+        advanced_frame.grid(row=4, column=0, columnspan=3, sticky="w", pady=5)
+        ttk.Checkbutton(advanced_frame, text="启用高级音频处理", variable=self.advanced_processing).grid(row=0, column=0, padx=(0, 10))
+        
+        # 处理档位选择（自动档位按目标实时率选择）
+        ttk.Label(advanced_frame, text="处理档位:").grid(row=0, column=1)
+        ttk.Combobox(advanced_frame, textvariable=self.processing_tier,
+                     values=list(self.tier_labels.values()), state="readonly", width=6).grid(row=0, column=2, padx=(0, 10))
+        ttk.Label(advanced_frame, text="目标实时率:").grid(row=0, column=3)
+        ttk.Entry(advanced_frame, textvariable=self.target_rtf, width=6).grid(row=0, column=4, padx=(0, 10))
+        ttk.Checkbutton(advanced_frame, text="跳过重复录音", variable=self.skip_duplicates).grid(row=0, column=5, padx=(0, 10))
+        ttk.Checkbutton(advanced_frame, text="打包输出", variable=self.pack_output).grid(row=0, column=6, padx=(0, 10))
+        ttk.Checkbutton(advanced_frame, text="音频分析", variable=self.analyze_audio).grid(row=0, column=7)
         
         # 处理说明
         ttk.Label(main_frame, text="高级处理包括:", foreground="gray").grid(row=5, column=0, columnspan=3, sticky="w")
@@ -127,8 +175,17 @@ class AudioSplitterApp:
         ttk.Button(output_frame, text="打开文件夹", command=self.open_output_folder).grid(row=0, column=2)
         
         # 开始处理按钮
-        self.start_button = ttk.Button(main_frame, text="开始处理", command=self.start_processing)
-        self.start_button.grid(row=10, column=0, columnspan=3, pady=20)
+        action_frame = ttk.Frame(main_frame)
+        action_frame.grid(row=10, column=0, columnspan=3, pady=20)
+        self.start_button = ttk.Button(action_frame, text="开始处理", command=self.start_processing)
+        self.start_button.grid(row=0, column=0, padx=(0, 20))
+        
+        # 试听单个片段（只渲染选定窗口，便于快速调整参数）
+        ttk.Label(action_frame, text="试听第").grid(row=0, column=1)
+        tk.Spinbox(action_frame, from_=1, to=9999, textvariable=self.preview_segment, width=5).grid(row=0, column=2)
+        ttk.Label(action_frame, text="段").grid(row=0, column=3, padx=(0, 5))
+        self.preview_button = ttk.Button(action_frame, text="试听", command=self.start_preview)
+        self.preview_button.grid(row=0, column=4)
         
         # 进度条
         ttk.Label(main_frame, text="处理进度:").grid(row=11, column=0, sticky="w", pady=5)
@@ -151,6 +208,13 @@ class AudioSplitterApp:
         # 配置行权重
         main_frame.rowconfigure(13, weight=1)
     
+    def get_processing_tier(self):
+        """将界面显示的档位名称转换为档位标识"""
+        for tier, label in self.tier_labels.items():
+            if label == self.processing_tier.get():
+                return tier
+        return "best"
+    
     def browse_folder(self):
         folder_selected = filedialog.askdirectory()
         if folder_selected:
@@ -185,23 +249,94 @@ class AudioSplitterApp:
         """打开输出文件夹"""
         output_folder = self.output_folder.get()
         if output_folder and os.path.exists(output_folder):
-            # 跨平台打开文件夹
             try:
-                system = platform.system()
-                if system == "Windows":
-                    os.startfile(output_folder)
-                elif system == "Darwin":  # macOS
-                    subprocess.run(["open", output_folder], check=True)
-                elif system == "Linux":
-                    subprocess.run(["xdg-open", output_folder], check=True)
-                else:
-                    # 其他系统使用webbrowser模块
-                    webbrowser.open(f"file://{output_folder}")
+                self.open_path(output_folder)
             except Exception as e:
                 messagebox.showerror("错误", f"无法打开文件夹: {str(e)}")
         else:
             messagebox.showwarning("警告", "输出文件夹不存在")
     
+    def open_path(self, path):
+        """使用系统默认程序打开文件或文件夹（跨平台）"""
+        system = platform.system()
+        if system == "Windows":
+            os.startfile(path)
+        elif system == "Darwin":  # macOS
+            subprocess.run(["open", path], check=True)
+        elif system == "Linux":
+            subprocess.run(["xdg-open", path], check=True)
+        else:
+            # 其他系统使用webbrowser模块
+            webbrowser.open(f"file://{path}")
+    
+    def start_preview(self):
+        """选择音频文件并试听指定片段"""
+        if self.segment_duration.get() <= 0:
+            messagebox.showerror("错误", "分割时长必须大于0")
+            return
+        
+        if self.preview_segment.get() <= 0:
+            messagebox.showerror("错误", "试听片段序号必须大于0")
+            return
+        
+        if not check_ffmpeg_available():
+            messagebox.showerror("错误", "未找到 ffmpeg，请确保已安装并添加到系统路径")
+            return
+        
+        file_selected = filedialog.askopenfilename(
+            title="选择试听的音频文件",
+            initialdir=self.audio_folder.get() or None,
+            filetypes=[("音频文件", "*.wav *.mp3 *.flac *.aac *.ogg *.m4a"), ("所有文件", "*.*")]
+        )
+        if not file_selected:
+            return
+        
+        # 保存配置
+        self.save_config()
+        
+        self.preview_button.config(state="disabled")
+        preview_thread = threading.Thread(target=self.render_preview, args=(file_selected,))
+        preview_thread.daemon = True
+        preview_thread.start()
+    
+    def render_preview(self, input_path):
+        """渲染试听片段并用系统播放器打开"""
+        try:
+            processing_tier = self.get_processing_tier()
+            if processing_tier == AUTO_TIER:
+                # 自动档位需要实测开销，试听时直接使用默认档位
+                processing_tier = DEFAULT_PROCESSING_TIER
+            transition_sound = self.transition_sound.get() if self.transition_sound.get() else None
+            segment_index = self.preview_segment.get() - 1
+            # 每次试听使用新文件名，播放器仍占用上一个文件时也能渲染
+            preview_dir = str(self.config_manager.get_cache_dir("preview"))
+            self.clear_previews(preview_dir)
+            self.preview_count += 1
+            output_path = os.path.join(preview_dir, f"preview_{int(time.time())}_{self.preview_count}.wav")
+            
+            start = time.perf_counter()
+            render_preview(input_path, output_path, self.segment_duration.get(), segment_index,
+                           transition_sound, processing_tier)
+            elapsed = time.perf_counter() - start
+            
+            self.log_message(f"试听 {os.path.basename(input_path)} 第{segment_index + 1}段 "
+                             f"(档位: {self.tier_labels[processing_tier]}, 耗时 {elapsed:.2f} 秒)")
+            self.open_path(output_path)
+        except Exception as e:
+            self.log_message(f"试听失败: {str(e)}")
+            messagebox.showerror("错误", f"试听失败:\n{str(e)}")
+        finally:
+            self.preview_button.config(state="normal")
+    
+    def clear_previews(self, preview_dir):
+        """删除旧的试听文件，仍被播放器占用的文件留到下次再删"""
+        for filename in os.listdir(preview_dir):
+            if filename.startswith("preview") and filename.endswith(".wav"):
+                try:
+                    os.remove(os.path.join(preview_dir, filename))
+                except OSError:
+                    pass
+    
     def log_message(self, message):
         self.log_text.config(state="normal")
         self.log_text.insert(tk.END, message + "\n")
@@ -217,6 +352,10 @@ class AudioSplitterApp:
             messagebox.showerror("错误", "分割时长必须大于0")
             return
         
+        if self.get_processing_tier() == AUTO_TIER and self.target_rtf.get() <= 0:
+            messagebox.showerror("错误", "目标实时率必须大于0")
+            return
+        
         # 检查ffmpeg是否可用
         if not check_ffmpeg_available():
             messagebox.showerror("错误", "未找到 ffmpeg，请确保已安装并添加到系统路径")
@@ -236,16 +375,19 @@ class AudioSplitterApp:
             folder_path = self.audio_folder.get()
             duration = self.segment_duration.get()
             output_format = self.output_format.get()
+            output_formats = [output_format] + [fmt for fmt, var in self.extra_output_formats.items()
+                                                if var.get() and fmt != output_format]
             transition_sound = self.transition_sound.get() if self.transition_sound.get() else None
+            pack_output = self.pack_output.get()
+            if pack_output:
+                # 打包输出固定为WAV容器，便于按偏移直接读取片段
+                output_formats = ["WAV"]
             
             self.status_var.set("正在扫描音频文件...")
             self.root.update()
             
             # 获取所有音频文件
-            audio_files = []
-            for file in os.listdir(folder_path):
-                if file.lower().endswith(('.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a')):
-                    audio_files.append(file)
+            audio_files = list_audio_files(folder_path)
             
             if not audio_files:
                 self.log_message("未找到音频文件")
@@ -264,8 +406,44 @@ class AudioSplitterApp:
             # 创建输出文件夹
             os.makedirs(output_folder, exist_ok=True)
             
+            # 确定本批次的处理档位
+            processing_tier = self.get_processing_tier()
+            if processing_tier == AUTO_TIER:
+                self.status_var.set("正在测量各处理档位开销...")
+                self.root.update()
+            try:
+                processing_tier, tier_costs = resolve_batch_tier(
+                    os.path.join(folder_path, audio_files[0]), processing_tier, self.target_rtf.get(),
+                    os.path.join(output_folder, "temp_benchmark"))
+            except Exception as e:
+                self.log_message(f"警告: 档位开销测量失败，使用默认档位{self.tier_labels[DEFAULT_PROCESSING_TIER]}: {str(e)}")
+                processing_tier, tier_costs = DEFAULT_PROCESSING_TIER, None
+            if tier_costs:
+                costs_text = ", ".join(f"{self.tier_labels[tier]} {cost:.3f}" for tier, cost in tier_costs.items())
+                self.log_message(f"档位实测实时率: {costs_text}")
+            self.log_message(f"处理档位: {self.tier_labels[processing_tier]}")
+            
+            # 按音频指纹分组重复录音，每组只处理一次
+            duplicate_groups = [(filename, []) for filename in audio_files]
+            if self.skip_duplicates.get() and total_files > 1:
+                self.status_var.set("正在识别重复录音...")
+                self.root.update()
+                try:
+                    groups = find_duplicate_groups([os.path.join(folder_path, f) for f in audio_files],
+                                                   str(self.config_manager.get_cache_dir("fingerprints")),
+                                                   str(self.config_manager.get_hash_index_path()))
+                    duplicate_groups = []
+                    for source, aliases in groups:
+                        for alias, bit_error_rate in aliases:
+                            self.log_message(f"重复录音: {os.path.basename(alias)} 与 {os.path.basename(source)} 相同"
+                                             f"（指纹误码率 {bit_error_rate:.3f}），将复用其片段")
+                        duplicate_groups.append((os.path.basename(source), [os.path.basename(a) for a, _ in aliases]))
+                except Exception as e:
+                    self.log_message(f"重复录音识别跳过: {str(e)}")
+            total_files = len(duplicate_groups)
+            
             # 处理每个音频文件
-            for i, filename in enumerate(audio_files):
+            for i, (filename, aliases) in enumerate(duplicate_groups):
                 self.status_var.set(f"正在处理: {filename} ({i+1}/{total_files})")
                 self.progress_var.set((i / total_files) * 100)
                 self.root.update()
@@ -275,16 +453,31 @@ class AudioSplitterApp:
                 
                 try:
                     # 处理单个音频文件
-                    segments = self.split_single_audio(input_path, output_folder, file_base_name, duration, output_format, transition_sound)
-                    self.log_message(f"  完成分割: {filename} -> {len(segments)} 个片段 ({output_format})")
+                    if pack_output:
+                        segments, segment_count = self.pack_single_audio(input_path, output_folder, file_base_name, duration, transition_sound, processing_tier)
+                    elif len(output_formats) > 1:
+                        segments = self.split_single_audio(input_path, output_folder, file_base_name, duration, output_formats, transition_sound, processing_tier)
+                        segment_count = len(segments[output_format])
+                    else:
+                        segments = self.split_single_audio(input_path, output_folder, file_base_name, duration, output_format, transition_sound, processing_tier)
+                        segment_count = len(segments)
+                    self.log_message(f"  完成分割: {filename} -> {segment_count} 个片段 ({', '.join(output_formats)})")
+                    
+                    # 为重复录音链接或复制片段
+                    for alias in aliases:
+                        link_segment_files(segments, file_base_name, os.path.splitext(alias)[0])
+                        self.log_message(f"  复用片段: {alias} -> {segment_count} 个片段")
                 except Exception as e:
                     self.log_message(f"处理 {filename} 时出错: {str(e)}")
             
+            if self.analyze_audio.get() or self.skip_duplicates.get():
+                save_content_hashes(str(self.config_manager.get_hash_index_path()))
+            
             self.progress_var.set(100)
             self.status_var.set("处理完成")
             self.log_message("所有文件处理完成")
             self.log_message(f"输出文件保存在: {output_folder}")
-            self.log_message(f"输出格式: {output_format}")
+            self.log_message(f"输出格式: {', '.join(output_formats)}{' (打包)' if pack_output else ''}")
             messagebox.showinfo("完成", "音频分割处理已完成")
             
         except Exception as e:
@@ -293,15 +486,41 @@ class AudioSplitterApp:
         finally:
             self.start_button.config(state="normal")
     
-    def split_single_audio(self, input_path, output_folder, file_base_name, segment_duration, output_format, transition_sound=None):
+    def split_single_audio(self, input_path, output_folder, file_base_name, segment_duration, output_format, transition_sound=None, processing_tier="best"):
         """处理单个音频文件"""
-        self.log_message(f"开始处理 {file_base_name} (格式: {output_format})")
+        if self.analyze_audio.get():
+            self.log_analysis(input_path)
+        format_label = output_format if isinstance(output_format, str) else ", ".join(output_format)
+        self.log_message(f"开始处理 {file_base_name} (格式: {format_label})")
         
         # 调用音频处理模块
-        segments = process_audio_file(input_path, output_folder, file_base_name, segment_duration, output_format, transition_sound)
+        segments = process_audio_file(input_path, output_folder, file_base_name, segment_duration, output_format, transition_sound, processing_tier)
         
         self.log_message(f"完成处理 {file_base_name}")
         return segments
+    
+    def pack_single_audio(self, input_path, output_folder, file_base_name, segment_duration, transition_sound=None, processing_tier="best"):
+        """处理单个音频文件并打包输出"""
+        if self.analyze_audio.get():
+            self.log_analysis(input_path)
+        self.log_message(f"开始处理 {file_base_name} (打包输出)")
+        
+        pack_files, segment_count = pack_audio_file(input_path, output_folder, file_base_name, segment_duration, transition_sound, processing_tier)
+        
+        self.log_message(f"完成处理 {file_base_name}")
+        return pack_files, segment_count
+    
+    def log_analysis(self, input_path):
+        """分析源文件特征（按内容哈希缓存，调整参数后重新处理可直接复用）"""
+        try:
+            cache_dir = str(self.config_manager.get_cache_dir("analysis"))
+            analysis = get_audio_analysis(input_path, cache_dir, str(self.config_manager.get_hash_index_path()))
+            self.log_message(f"  音频分析: {format_analysis_summary(analysis)}")
+            return analysis
+        except Exception as e:
+            # 分析失败不影响分割流程
+            self.log_message(f"  音频分析跳过: {str(e)}")
+            return None
 
 
 def main():
@@ -13,7 +13,13 @@ class ConfigManager:
             "advanced_processing": True,
             "output_folder": "",
             "output_format": "WAV",  # 默认输出格式
+            "extra_output_formats": [],  # 附加输出格式，与主格式在同一次处理中输出
             "transition_sound": "",  # 过渡音效文件路径
+            "processing_tier": "best",  # 清理链处理档位：fast / balanced / best / auto
+            "target_rtf": 0.1,  # 自动档位的目标实时率（处理耗时 / 音频时长）
+            "analyze_audio": False,  # 分析源文件特征（响度、噪声底、人声分布）并缓存
+            "skip_duplicates": False,  # 通过音频指纹识别重复录音，只处理一次（误判会复用错误的片段，默认关闭）
+            "pack_output": False,  # 每个输入打包为一个WAV容器和片段索引，代替大量小文件
             "window_geometry": "650x520"
         }
         self.config = self.load_config()
@@ -32,6 +38,16 @@ class ConfigManager:
         config_dir.mkdir(parents=True, exist_ok=True)
         return config_dir / "config.json"
     
+    def get_cache_dir(self, name):
+        """获取缓存目录（位于配置目录下）"""
+        cache_dir = self.config_file.parent / "cache" / name
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        return cache_dir
+    
+    def get_hash_index_path(self):
+        """获取内容哈希索引文件路径（分析缓存和指纹索引共用）"""
+        return self.get_cache_dir("hashes") / "content_hashes.json"
+    
     def load_config(self):
         """加载配置"""
         try:
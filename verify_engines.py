@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+处理引擎等价性验证：在生成的测试音频上分别运行参考流程和候选引擎，
+逐片段比较片段数、边界（精确到采样）、时长、RMS/频谱差异和淡出包络，并报告加速比。
+片段边界在候选引擎自身的清理后音频中定位，不受各档位滤镜延迟差异的影响。
+
+用法:
+    python verify_engines.py                       # 验证所有已注册的候选引擎
+    python verify_engines.py -c pack -c balanced   # 只验证指定引擎
+"""
+
+import os
+import sys
+import time
+import wave
+import shutil
+import argparse
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅验证工具需要
+    np = None
+
+from audio_processor import (process_audio_file, remove_silence_advanced, check_ffmpeg_available, PROCESSING_TIERS,
+                             DEFAULT_PROCESSING_TIER)
+from audio_pack import pack_audio_file, extract_pack_segment, get_pack_paths
+
+
+FIXTURE_DURATION = 20  # 每个测试音频时长（秒）
+SEGMENT_DURATION = 5
+FADE_WINDOW = 0.3  # 比较片段末尾多长的淡出包络（秒）
+ENVELOPE_FRAME = 0.01  # 包络帧长（秒）
+ENVELOPE_FLOOR_DB = -80.0
+SPECTRUM_FFT_SIZE = 2048
+BOUNDARY_MAX_LAG = 0.05  # 搜索片段起点偏差的范围（秒）
+BOUNDARY_WINDOW = 8192  # 用于互相关定位的片段窗口（采样）
+BOUNDARY_SKIP = 0.5  # 定位窗口避开片段开头（过渡音效混合区）的时长（秒）
+
+# 默认容差，候选引擎所有片段均满足时判定为等价
+DEFAULT_TOLERANCES = {
+    "boundary_samples": 0,  # 片段起点和长度允许的采样误差
+    "min_snr_db": 30.0,  # 与参考输出之差的信噪比下限
+    "rms_delta_db": 0.5,  # 片段整体电平差上限
+    "spectral_distance_db": 1.0,  # 对数谱距离上限
+    "fade_envelope_db": 1.0,  # 末尾淡出包络最大偏差上限
+}
+
+# 有损引擎（如更轻的清理档位）只校验片段数和边界，质量指标仅作报告，容差为None表示不参与判定
+QUALITY_KEYS = ("min_snr_db", "rms_delta_db", "spectral_distance_db", "fade_envelope_db")
+STRUCTURAL_TOLERANCES = dict(DEFAULT_TOLERANCES, **{key: None for key in QUALITY_KEYS})
+
+
+def _reference_engine(input_path, output_folder, file_base_name, segment_duration, transition_sound_path):
+    return process_audio_file(input_path, output_folder, file_base_name, segment_duration, "WAV", transition_sound_path)
+
+
+def _tier_engine(tier):
+    def engine(input_path, output_folder, file_base_name, segment_duration, transition_sound_path):
+        return process_audio_file(input_path, output_folder, file_base_name, segment_duration, "WAV",
+                                  transition_sound_path, tier)
+    return engine
+
+
+def _tier_clean(tier):
+    def clean(input_path, output_path):
+        return remove_silence_advanced(input_path, output_path, tier)
+    return clean
+
+
+def _pack_engine(input_path, output_folder, file_base_name, segment_duration, transition_sound_path):
+    files, segment_count = pack_audio_file(input_path, output_folder, file_base_name, segment_duration,
+                                           transition_sound_path)
+    pack_path, _ = get_pack_paths(output_folder, file_base_name)
+    return [extract_pack_segment(pack_path, i + 1, os.path.join(output_folder, f"{file_base_name}_part{i+1:03d}.wav"))
+            for i in range(segment_count)]
+
+
+# 候选引擎注册表：engine 的签名与参考流程相同，返回WAV片段文件列表；
+# clean 生成该引擎分割前的清理后音频，用于定位片段边界；tolerances 为该引擎的判定容差
+CANDIDATE_ENGINES = {"pack": {"engine": _pack_engine, "clean": _tier_clean(DEFAULT_PROCESSING_TIER),
+                              "tolerances": DEFAULT_TOLERANCES}}
+CANDIDATE_ENGINES.update({tier: {"engine": _tier_engine(tier), "clean": _tier_clean(tier),
+                                 "tolerances": STRUCTURAL_TOLERANCES}
+                          for tier in PROCESSING_TIERS if tier != DEFAULT_PROCESSING_TIER})
+
+
+def _write_wav(path, samples, sample_rate):
+    """将 [-1, 1] 浮点采样（帧数 x 声道数）写为16位WAV"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(pcm.shape[1])
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+    return path
+
+
+def _speech_like(duration, sample_rate, rng):
+    """合成类人声信号：带谐波的音节、停顿和起伏的基频"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    signal = np.zeros_like(t)
+    position = 0.0
+    while position < duration:
+        length = rng.uniform(0.15, 0.4)
+        f0 = rng.uniform(100, 220)
+        mask = (t >= position) & (t < position + length)
+        local = t[mask] - position
+        envelope = np.sin(np.pi * local / length) ** 2
+        pitch = f0 * (1 + 0.05 * np.sin(2 * np.pi * 3 * local))
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        signal[mask] += envelope * sum(np.sin(k * phase) / k for k in range(1, 15) if k * f0 < 3500)
+        position += length + rng.uniform(0.02, 0.3)  # 音节间停顿
+    return 0.3 * signal / max(np.abs(signal).max(), 1e-9)
+
+
+def generate_fixtures(fixture_folder, seed=0):
+    """生成测试音频，返回 {名称: (音频路径, 过渡音效路径或None)}"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(fixture_folder, exist_ok=True)
+
+    speech = _speech_like(FIXTURE_DURATION, 44100, rng)
+    mono = speech[:, None]
+    noisy = (speech + 0.02 * rng.standard_normal(len(speech)))[:, None]
+    speech_48k = _speech_like(FIXTURE_DURATION, 48000, rng)
+    stereo = np.stack([speech_48k, np.roll(speech_48k, 30) * 0.8], axis=1)
+    transition = (np.exp(-np.linspace(0, 8, 8820)) * rng.standard_normal(8820) * 0.2)[:, None]
+
+    transition_path = _write_wav(os.path.join(fixture_folder, "transition.wav"), transition, 44100)
+    return {
+        "mono_speech": (_write_wav(os.path.join(fixture_folder, "mono_speech.wav"), mono, 44100), None),
+        "noisy_speech": (_write_wav(os.path.join(fixture_folder, "noisy_speech.wav"), noisy, 44100), None),
+        "stereo_48k": (_write_wav(os.path.join(fixture_folder, "stereo_48k.wav"), stereo, 48000), None),
+        "with_transition": (os.path.join(fixture_folder, "mono_speech.wav"), transition_path),
+    }
+
+
+def read_wav(path):
+    """读取WAV为单声道float64采样，返回 (采样, 采样率)"""
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise Exception(f"只支持16位WAV: {path}")
+        channels = w.getnchannels()
+        sample_rate = w.getframerate()
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+    samples = pcm.reshape(-1, channels).mean(axis=1) / 32768.0
+    return samples, sample_rate
+
+
+def _db(value):
+    return 10.0 * np.log10(max(value, 1e-20))
+
+
+def _envelope_db(samples, sample_rate):
+    frame = max(1, int(sample_rate * ENVELOPE_FRAME))
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    return np.maximum(10.0 * np.log10(np.maximum(np.mean(frames ** 2, axis=1), 1e-20)), ENVELOPE_FLOOR_DB)
+
+
+def _log_spectrum(samples):
+    count = len(samples) // SPECTRUM_FFT_SIZE
+    if count == 0:
+        return np.zeros((0, SPECTRUM_FFT_SIZE // 2 + 1))
+    frames = samples[:count * SPECTRUM_FFT_SIZE].reshape(count, SPECTRUM_FFT_SIZE) * np.hanning(SPECTRUM_FFT_SIZE)
+    return 10.0 * np.log10(np.abs(np.fft.rfft(frames, axis=1)) ** 2 + 1e-12)
+
+
+def estimate_start_offset(source, segment, expected_start, sample_rate):
+    """以归一化互相关估计片段在清理后音频中的起点相对预期位置的偏差（采样，正值表示偏后）
+
+    source 为同一引擎分割前的清理后音频，与片段经过相同的滤镜，不含滤镜延迟差异。
+    在片段中避开开头过渡音效和末尾淡出、能量最大的窗口上，于 ±BOUNDARY_MAX_LAG 范围内搜索最佳对齐位置。
+    片段过短或该窗口为静音时无法定位，返回0。
+    """
+    max_lag = int(BOUNDARY_MAX_LAG * sample_rate)
+    skip = int(BOUNDARY_SKIP * sample_rate)
+    usable_end = len(segment) - int(FADE_WINDOW * sample_rate)
+    window = min(BOUNDARY_WINDOW, usable_end - skip)
+    if window <= 0:
+        return 0
+
+    # 选取片段中能量最大的窗口，避开停顿
+    energy = np.concatenate([[0.0], np.cumsum(segment ** 2)])
+    starts = np.arange(skip, usable_end - window + 1, max(1, window // 2))
+    position = int(starts[np.argmax(energy[starts + window] - energy[starts])])
+    segment_window = segment[position:position + window]
+    segment_energy = np.sum(segment_window ** 2)
+    if segment_energy <= 0:
+        return 0
+
+    # 两端补零，预期位置靠近音频边界时也能搜索完整范围
+    padded = np.concatenate([np.zeros(max_lag), source, np.zeros(len(segment) + max_lag)])
+    search_start = max(0, expected_start + position)
+    source_window = padded[search_start:search_start + window + 2 * max_lag]
+    size = 1 << int(np.ceil(np.log2(len(source_window) + window)))
+    correlation = np.fft.irfft(np.fft.rfft(source_window, size) * np.conj(np.fft.rfft(segment_window, size)), size)
+    correlation = correlation[:2 * max_lag + 1]
+    source_energy = np.concatenate([[0.0], np.cumsum(source_window ** 2)])
+    lags = np.arange(2 * max_lag + 1)
+    norms = np.sqrt((source_energy[lags + window] - source_energy[lags]) * segment_energy)
+    scores = np.where(norms > 0, correlation / np.maximum(norms, 1e-20), -1.0)
+
+    # 片段第 position 个采样对应清理后音频第 expected_start + position - max_lag + k 个采样
+    return int(np.argmax(scores)) - max_lag
+
+
+def compare_segments(reference, candidate, sample_rate):
+    """比较一对片段，返回各项差异指标"""
+    length = min(len(reference), len(candidate))
+    ref, cand = reference[:length], candidate[:length]
+    noise = np.sum((ref - cand) ** 2)
+    signal = np.sum(ref ** 2)
+
+    fade_frames = int(FADE_WINDOW * sample_rate)
+    ref_fade = _envelope_db(reference[-fade_frames:], sample_rate)
+    cand_fade = _envelope_db(candidate[-fade_frames:], sample_rate)
+    fade_length = min(len(ref_fade), len(cand_fade))
+
+    ref_spectrum, cand_spectrum = _log_spectrum(ref), _log_spectrum(cand)
+    spectral_distance = float(np.mean(np.sqrt(np.mean((ref_spectrum - cand_spectrum) ** 2, axis=1)))) \
+        if len(ref_spectrum) else 0.0
+
+    return {
+        "length_delta": len(candidate) - len(reference),
+        "snr_db": float("inf") if noise == 0 else _db(signal) - _db(noise),
+        "rms_delta_db": abs(_db(np.mean(cand ** 2)) - _db(np.mean(ref ** 2))) if length else 0.0,
+        "spectral_distance_db": spectral_distance,
+        "fade_envelope_db": float(np.max(np.abs(ref_fade[:fade_length] - cand_fade[:fade_length])))
+        if fade_length else 0.0,
+    }
+
+
+def compare_outputs(reference_files, candidate_files, tolerances, candidate_source, segment_duration=SEGMENT_DURATION):
+    """比较参考流程和候选引擎的全部片段，返回汇总结果（容差为None的指标只报告不判定）
+
+    candidate_source 为候选引擎分割前的清理后音频，片段边界按分割时长在其中定位。
+    """
+    failures = []
+    source, source_rate = read_wav(candidate_source)
+    if len(reference_files) != len(candidate_files):
+        failures.append(f"片段数不同: 参考 {len(reference_files)}, 候选 {len(candidate_files)}")
+
+    worst = {"boundary_samples": 0, "min_snr_db": float("inf"), "rms_delta_db": 0.0,
+             "spectral_distance_db": 0.0, "fade_envelope_db": 0.0}
+    for number, (ref_file, cand_file) in enumerate(zip(reference_files, candidate_files), start=1):
+        reference, ref_rate = read_wav(ref_file)
+        candidate, cand_rate = read_wav(cand_file)
+        if ref_rate != cand_rate:
+            failures.append(f"第{number}段采样率不同: {ref_rate} / {cand_rate}")
+            continue
+
+        if cand_rate != source_rate:
+            failures.append(f"第{number}段采样率与清理后音频不同: {cand_rate} / {source_rate}")
+            continue
+
+        metrics = compare_segments(reference, candidate, ref_rate)
+        # 边界误差：实测的起点偏差与由此推出的终点偏差中的较大者
+        expected_start = int(round((number - 1) * segment_duration * source_rate))
+        expected_length = min(int(round(segment_duration * source_rate)), len(source) - expected_start)
+        start_offset = estimate_start_offset(source, candidate, expected_start, source_rate)
+        length_error = len(candidate) - expected_length
+        boundary_error = max(abs(start_offset), abs(start_offset + length_error))
+
+        worst["boundary_samples"] = max(worst["boundary_samples"], boundary_error)
+        worst["min_snr_db"] = min(worst["min_snr_db"], metrics["snr_db"])
+        for key in ("rms_delta_db", "spectral_distance_db", "fade_envelope_db"):
+            worst[key] = max(worst[key], metrics[key])
+
+        if boundary_error > tolerances["boundary_samples"]:
+            failures.append(f"第{number}段边界偏差 {boundary_error} 个采样（起点 {start_offset:+d}，"
+                            f"长度 {length_error:+d}）")
+        if tolerances["min_snr_db"] is not None and metrics["snr_db"] < tolerances["min_snr_db"]:
+            failures.append(f"第{number}段信噪比 {metrics['snr_db']:.1f} dB")
+        for key, label in (("rms_delta_db", "电平差"), ("spectral_distance_db", "谱距离"), ("fade_envelope_db", "淡出包络偏差")):
+            if tolerances[key] is not None and metrics[key] > tolerances[key]:
+                failures.append(f"第{number}段{label} {metrics[key]:.2f} dB")
+
+    return {"segments": len(candidate_files), "worst": worst, "failures": failures}
+
+
+def _run_engine(engine, input_path, transition_path, work_folder, segment_duration):
+    os.makedirs(work_folder, exist_ok=True)
+    start = time.perf_counter()
+    files = engine(input_path, work_folder, "fixture", segment_duration, transition_path)
+    return files, time.perf_counter() - start
+
+
+def run_verification(candidates, fixtures, work_folder, segment_duration=SEGMENT_DURATION, tolerances=None):
+    """在每个测试音频上运行参考流程和候选引擎，返回结果列表
+
+    每个引擎使用注册表中的容差，tolerances 可覆盖其中的部分项。
+    """
+    results = []
+    for fixture_name, (input_path, transition_path) in fixtures.items():
+        reference_files, reference_time = _run_engine(
+            _reference_engine, input_path, transition_path,
+            os.path.join(work_folder, fixture_name, "reference"), segment_duration)
+        for candidate in candidates:
+            engine_tolerances = dict(CANDIDATE_ENGINES[candidate]["tolerances"], **(tolerances or {}))
+            candidate_folder = os.path.join(work_folder, fixture_name, candidate)
+            try:
+                candidate_files, candidate_time = _run_engine(
+                    CANDIDATE_ENGINES[candidate]["engine"], input_path, transition_path,
+                    candidate_folder, segment_duration)
+                # 清理后音频不计入耗时，只用于定位片段边界
+                candidate_source = CANDIDATE_ENGINES[candidate]["clean"](
+                    input_path, os.path.join(candidate_folder, "source_clean.wav"))
+                result = compare_outputs(reference_files, candidate_files, engine_tolerances,
+                                         candidate_source, segment_duration)
+                result["speedup"] = reference_time / candidate_time if candidate_time > 0 else float("inf")
+            except Exception as e:
+                result = {"segments": 0, "worst": None, "failures": [f"运行失败: {str(e)}"], "speedup": 0.0}
+            result.update({"fixture": fixture_name, "candidate": candidate,
+                           "passed": not result["failures"],
+                           "quality_checked": any(engine_tolerances[key] is not None for key in QUALITY_KEYS)})
+            results.append(result)
+    return results
+
+
+def format_report(results):
+    """生成文本报告：每个候选引擎在每个测试音频上的加速比和质量差异"""
+    lines = [f"{'候选引擎':<10}{'测试音频':<18}{'结果':<6}{'加速比':>8}{'片段':>6}"
+             f"{'边界':>6}{'信噪比dB':>10}{'电平差dB':>10}{'谱距离dB':>10}{'淡出dB':>8}"]
+    for result in results:
+        worst = result["worst"]
+        status = ("通过" if result["passed"] else "失败") + ("" if result["quality_checked"] else "*")
+        if worst:
+            metrics = (f"{worst['boundary_samples']:>6}{worst['min_snr_db']:>10.1f}{worst['rms_delta_db']:>10.2f}"
+                       f"{worst['spectral_distance_db']:>10.2f}{worst['fade_envelope_db']:>8.2f}")
+        else:
+            metrics = ""
+        lines.append(f"{result['candidate']:<10}{result['fixture']:<18}{status:<6}"
+                     f"{result['speedup']:>7.2f}x{result['segments']:>6}{metrics}")
+        for failure in result["failures"]:
+            lines.append(f"    - {failure}")
+    if not all(result["quality_checked"] for result in results):
+        lines.append("* 仅校验片段数和边界，质量差异仅供参考，不计入通过判定")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="验证候选处理引擎与参考流程的输出是否等价")
+    parser.add_argument("-c", "--candidate", dest="candidates", action="append", choices=list(CANDIDATE_ENGINES),
+                        help="要验证的候选引擎，可重复指定，默认全部")
+    parser.add_argument("-d", "--duration", type=int, default=SEGMENT_DURATION, help="分割时长（秒）")
+    parser.add_argument("--keep", action="store_true", help="保留测试音频和输出，便于人工检查")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("验证工具需要安装numpy: pip install numpy")
+        return 1
+    if not check_ffmpeg_available():
+        print("未找到 ffmpeg，请确保已安装并添加到系统路径")
+        return 1
+
+    work_folder = tempfile.mkdtemp(prefix="audiosplitter_verify_")
+    try:
+        fixtures = generate_fixtures(os.path.join(work_folder, "fixtures"))
+        results = run_verification(args.candidates or list(CANDIDATE_ENGINES), fixtures, work_folder, args.duration)
+        print(format_report(results))
+        if args.keep:
+            print(f"测试文件保存在: {work_folder}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_folder, ignore_errors=True)
+    return 0 if all(result["passed"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())